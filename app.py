@@ -1,11 +1,24 @@
 from flask import Flask, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import orjson
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import execute_values
 import os
 import io
-import pandas as pd
+import csv
+import itertools
+import heapq
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import bcrypt
 import numpy as np
+import xlsxwriter
 from datetime import datetime, timedelta
 from functools import wraps
 from flask_jwt_extended import (
@@ -15,7 +28,20 @@ from flask_jwt_extended import (
     get_jwt
 )
 
+class ORJSONProvider(DefaultJSONProvider):
+    # Sorted keys match Flask's default output
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # =========================
@@ -28,36 +54,166 @@ jwt = JWTManager(app)
 # =========================
 # DATABASE CONNECTION
 # =========================
-def get_connection():
-    url = os.environ.get("DATABASE_URL")
-
-    if not url:
-        raise Exception("DATABASE_URL not set")
-
-    if url.startswith("postgres://"):
-        url = url.replace("postgres://", "postgresql://", 1)
-
-    return psycopg2.connect(url)
+# One connection per gunicorn thread, all kept open (see gunicorn.conf.py)
+POOL_MAX_CONN = int(os.environ.get("GUNICORN_THREADS", "8"))
+POOL_MIN_CONN = POOL_MAX_CONN
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    # Created lazily so each gunicorn worker builds its own pool after fork
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                url = os.environ.get("DATABASE_URL")
+
+                if not url:
+                    raise Exception("DATABASE_URL not set")
+
+                if url.startswith("postgres://"):
+                    url = url.replace("postgres://", "postgresql://", 1)
+
+                # sslmode comes from the URL or PGSSLMODE
+                _pool = ThreadedConnectionPool(
+                    POOL_MIN_CONN,
+                    POOL_MAX_CONN,
+                    dsn=url,
+                    connect_timeout=5,
+                    application_name="hostel-water-backend",
+                    keepalives=1,
+                    keepalives_idle=30
+                )
+
+    return _pool
+
+def reset_pool():
+    # After fork: drop, don't close, the parent's connections
+    global _pool
+    _pool = None
+
+@contextmanager
+def get_conn():
+    pool = get_pool()
+    conn = pool.getconn()
+
+    try:
+        yield conn
+    finally:
+        # Roll back open transactions; close connections that can't
+        try:
+            if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+        except psycopg2.Error:
+            pool.putconn(conn, close=True)
+        else:
+            pool.putconn(conn)
 
 # =========================
 # USERS TABLE SAFE INIT (Flask 3 Compatible)
 # =========================
 def create_users_table():
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            username VARCHAR(100) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            role VARCHAR(50) NOT NULL
-        )
-    """)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id SERIAL PRIMARY KEY,
+                    username VARCHAR(100) UNIQUE NOT NULL,
+                    password VARCHAR(255) NOT NULL,
+                    role VARCHAR(50) NOT NULL
+                )
+            """)
+
+            conn.commit()
+
+# =========================
+# READINGS TABLE + INDEXES
+# =========================
+def create_readings_table():
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS readings (
+                    id SERIAL PRIMARY KEY,
+                    hostel_name VARCHAR(100) NOT NULL,
+                    date DATE NOT NULL,
+                    domestic_reading FLOAT,
+                    flush_reading FLOAT,
+                    domestic_usage FLOAT,
+                    flush_usage FLOAT,
+                    total_usage FLOAT,
+                    anomaly_flag INTEGER
+                )
+            """)
+
+            # Latest-reading-per-hostel lookups in /add_reading
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_readings_hostel_date
+                ON readings (hostel_name, date DESC)
+            """)
+
+            # MAX(date) in /dashboard and the date range scan in /export
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_readings_date
+                ON readings (date)
+            """)
+
+            conn.commit()
+
+_db_ready = False
+_db_init_lock = threading.Lock()
+
+def init_db():
+    # The DDL above only needs to run once per process, not per /login
+    global _db_ready
+
+    if _db_ready:
+        return
+
+    with _db_init_lock:
+        if not _db_ready:
+            create_users_table()
+            create_readings_table()
+            _db_ready = True
+
+# =========================
+# RESPONSE CACHE
+# =========================
+RESPONSE_CACHE_TTL = 30
+RESPONSE_CACHE_SIZE = 128
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def cache_get(key):
+    with _response_cache_lock:
+        entry = _response_cache.get(key)
+
+        if entry is None:
+            return None
+
+        expires, body = entry
+        if expires < time.monotonic():
+            del _response_cache[key]
+            return None
+
+        _response_cache.move_to_end(key)
+        return body
 
-    conn.commit()
-    cur.close()
-    conn.close()
+def cache_set(key, body):
+    with _response_cache_lock:
+        _response_cache[key] = (time.monotonic() + RESPONSE_CACHE_TTL, body)
+        _response_cache.move_to_end(key)
+
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+def invalidate_response_cache():
+    # Only clears this worker; other workers expire within the TTL
+    with _response_cache_lock:
+        _response_cache.clear()
 
 # =========================
 # ROLE DECORATOR
@@ -81,54 +237,58 @@ def role_required(allowed_roles):
 # AUTH ROUTES
 # =========================
 
+# Lower only if every stored hash uses the same cost (see _DUMMY_HASH)
+HASH_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# Checked for unknown usernames so /login timing doesn't reveal accounts
+_DUMMY_HASH = bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(rounds=HASH_ROUNDS))
+
+def hash_rounds(hashed_pw):
+    # $2b$12$... -> 12
+    return int(hashed_pw.split("$")[2])
+
 @app.route("/init_admin", methods=["POST"])
 def init_admin():
 
-    create_users_table()
+    init_db()
 
     data = request.json
     username = data["username"]
     password = data["password"]
 
-    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=HASH_ROUNDS))
 
-    conn = get_connection()
-    cur = conn.cursor()
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE username=%s", (username,))
+            if cur.fetchone():
+                return {"message": "Admin already exists"}, 400
 
-    cur.execute("SELECT * FROM users WHERE username=%s", (username,))
-    if cur.fetchone():
-        return {"message": "Admin already exists"}, 400
+            cur.execute(
+                "INSERT INTO users (username,password,role) VALUES (%s,%s,%s)",
+                (username, hashed_pw.decode("utf-8"), "admin")
+            )
 
-    cur.execute(
-        "INSERT INTO users (username,password,role) VALUES (%s,%s,%s)",
-        (username, hashed_pw.decode("utf-8"), "admin")
-    )
-
-    conn.commit()
-    cur.close()
-    conn.close()
+            conn.commit()
 
     return {"message": "Admin created successfully"}
 
 @app.route("/login", methods=["POST"])
 def login():
 
-    create_users_table()
+    init_db()
 
     data = request.json
     username = data["username"]
     password = data["password"]
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id,password,role FROM users WHERE username=%s",(username,))
-    user = cur.fetchone()
-
-    cur.close()
-    conn.close()
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id,password,role FROM users WHERE username=%s",(username,))
+            user = cur.fetchone()
 
     if not user:
+        bcrypt.checkpw(password.encode("utf-8"), _DUMMY_HASH)
         return {"message":"Invalid credentials"},401
 
     user_id, hashed_pw, role = user
@@ -136,6 +296,19 @@ def login():
     if not bcrypt.checkpw(password.encode("utf-8"), hashed_pw.encode("utf-8")):
         return {"message":"Invalid credentials"},401
 
+    # Upgrade weaker hashes while the password is at hand, never downgrade
+    if hash_rounds(hashed_pw) < HASH_ROUNDS:
+        new_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=HASH_ROUNDS))
+
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE users SET password=%s WHERE id=%s",
+                    (new_hash.decode("utf-8"), user_id)
+                )
+
+                conn.commit()
+
     token = create_access_token(
         identity=user_id,
         additional_claims={"role": role}
@@ -155,23 +328,20 @@ def create_user():
     if role not in ["manager","pump_operator"]:
         return {"message":"Invalid role"},400
 
-    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    hashed_pw = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=HASH_ROUNDS))
 
-    conn = get_connection()
-    cur = conn.cursor()
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM users WHERE username=%s",(username,))
+            if cur.fetchone():
+                return {"message":"User already exists"},400
 
-    cur.execute("SELECT * FROM users WHERE username=%s",(username,))
-    if cur.fetchone():
-        return {"message":"User already exists"},400
-
-    cur.execute(
-        "INSERT INTO users (username,password,role) VALUES (%s,%s,%s)",
-        (username, hashed_pw.decode("utf-8"), role)
-    )
+            cur.execute(
+                "INSERT INTO users (username,password,role) VALUES (%s,%s,%s)",
+                (username, hashed_pw.decode("utf-8"), role)
+            )
 
-    conn.commit()
-    cur.close()
-    conn.close()
+            conn.commit()
 
     return {"message":"User created successfully"}
 
@@ -191,10 +361,109 @@ AREAS = [
     "HOUSING FACILITY 5"
 ]
 
+AREA_IDX = {area: i for i, area in enumerate(AREAS)}
+
+# Daily usage (domestic + flush) above this is flagged as an anomaly
+ANOMALY_THRESHOLD = 500
+
+# Report layout: one flush and one domestic column per area
+EXPORT_COLUMNS = [c for a in AREAS for c in (f"{a} F", f"{a} D")]
+
+# Params: EXPORT_PARAMS, then start and end date
+EXPORT_SQL = """
+    SELECT date AS "Date", {columns}
+    FROM readings
+    WHERE date BETWEEN %s AND %s
+    GROUP BY date
+    ORDER BY date ASC
+""".format(columns=", ".join(
+    f'COALESCE(SUM({column}) FILTER (WHERE hostel_name = %s), 0) AS "{area} {suffix}"'
+    for area in AREAS
+    for column, suffix in (("flush_usage", "F"), ("domestic_usage", "D"))
+))
+EXPORT_PARAMS = [area for area in AREAS for _ in range(2)]
+
+# XLSX exports stay in memory up to this size, then spill to disk
+EXPORT_SPOOL_SIZE = 8 * 1024 * 1024
+# Rows fetched per round trip while streaming a CSV export
+EXPORT_BATCH_ROWS = 2000
+
+# Constant payloads are serialized once at import, not per request
+AREAS_JSON = app.json.dumps({"areas": AREAS})
+
 @app.route("/areas")
 @jwt_required()
 def get_areas():
-    return jsonify({"areas": AREAS})
+    response = app.response_class(AREAS_JSON, mimetype="application/json")
+    # Behind auth, so only the client may cache it
+    response.headers["Cache-Control"] = "private, max-age=86400"
+    return response
+
+def save_readings(readings):
+    # Usage and anomaly rule for both /add_reading and /add_readings
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Diff against the previous reading in the batch, else the stored one
+            inserted = execute_values(cur, """
+                WITH batch (ord, hostel_name, date, domestic_reading, flush_reading) AS (
+                    VALUES %s
+                ),
+                prev AS (
+                    SELECT DISTINCT ON (hostel_name)
+                           hostel_name, domestic_reading, flush_reading
+                    FROM readings
+                    WHERE hostel_name IN (SELECT hostel_name FROM batch)
+                    ORDER BY hostel_name, date DESC, id DESC
+                ),
+                usage AS (
+                    SELECT b.ord, b.hostel_name, b.date,
+                           b.domestic_reading, b.flush_reading,
+                           b.domestic_reading - COALESCE(
+                               LAG(b.domestic_reading) OVER w, p.domestic_reading, 0
+                           ) AS domestic_usage,
+                           b.flush_reading - COALESCE(
+                               LAG(b.flush_reading) OVER w, p.flush_reading, 0
+                           ) AS flush_usage
+                    FROM batch b
+                    LEFT JOIN prev p ON p.hostel_name = b.hostel_name
+                    WINDOW w AS (PARTITION BY b.hostel_name ORDER BY b.ord)
+                )
+                INSERT INTO readings
+                (hostel_name,date,domestic_reading,flush_reading,
+                 domestic_usage,flush_usage,total_usage,anomaly_flag)
+                SELECT hostel_name, date, domestic_reading, flush_reading,
+                       domestic_usage, flush_usage,
+                       domestic_usage + flush_usage,
+                       CASE WHEN domestic_usage + flush_usage > {threshold} THEN 1 ELSE 0 END
+                FROM usage
+                ORDER BY ord
+                RETURNING id, domestic_usage, flush_usage, total_usage, anomaly_flag
+            """.format(threshold=ANOMALY_THRESHOLD),
+                [(i, *reading) for i, reading in enumerate(readings)],
+                template="(%s, %s, %s::date, %s::float8, %s::float8)",
+                page_size=len(readings),
+                fetch=True
+            )
+
+            conn.commit()
+
+    invalidate_response_cache()
+
+    # ids follow the ORDER BY above, so they line up with the input
+    inserted.sort()
+
+    return [
+        {
+            "hostel_name": hostel,
+            "date": date_val,
+            "domestic_usage": domestic_usage,
+            "flush_usage": flush_usage,
+            "total_usage": total_usage,
+            "anomaly_flag": anomaly
+        }
+        for (hostel, date_val, _, _), (_, domestic_usage, flush_usage, total_usage, anomaly)
+        in zip(readings, inserted)
+    ]
 
 @app.route("/add_reading", methods=["POST"])
 @role_required(["admin","manager","pump_operator"])
@@ -202,111 +471,130 @@ def add_reading():
 
     data = request.get_json()
 
-    hostel = data["hostel_name"]
-    date_val = data["date"]
-    domestic_today = float(data["domestic_reading"])
-    flush_today = float(data["flush_reading"])
-
-    conn = get_connection()
-    cur = conn.cursor()
+    result = save_readings([(
+        data["hostel_name"],
+        data["date"],
+        float(data["domestic_reading"]),
+        float(data["flush_reading"])
+    )])[0]
 
-    cur.execute("""
-        SELECT domestic_reading, flush_reading
-        FROM readings
-        WHERE hostel_name=%s
-        ORDER BY date DESC
-        LIMIT 1
-    """,(hostel,))
+    return jsonify({
+        "domestic_usage": result["domestic_usage"],
+        "flush_usage": result["flush_usage"],
+        "total_usage": result["total_usage"],
+        "anomaly_flag": result["anomaly_flag"]
+    })
 
-    prev = cur.fetchone()
-    prev_domestic = prev[0] if prev else 0
-    prev_flush = prev[1] if prev else 0
+@app.route("/add_readings", methods=["POST"])
+@role_required(["admin","manager","pump_operator"])
+def add_readings():
 
-    domestic_usage = domestic_today - prev_domestic
-    flush_usage = flush_today - prev_flush
-    total_usage = domestic_usage + flush_usage
+    # Bulk /add_reading; readings chain per hostel in the order given
+    data = request.get_json()
 
-    anomaly = 1 if total_usage > 500 else 0
+    if not isinstance(data, list):
+        return {"message":"Expected a JSON array of readings"},400
 
-    cur.execute("""
-        INSERT INTO readings
-        (hostel_name,date,domestic_reading,flush_reading,
-         domestic_usage,flush_usage,total_usage,anomaly_flag)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-    """,(hostel,date_val,domestic_today,flush_today,
-         domestic_usage,flush_usage,total_usage,anomaly))
+    readings = [
+        (
+            item["hostel_name"],
+            item["date"],
+            float(item["domestic_reading"]),
+            float(item["flush_reading"])
+        )
+        for item in data
+    ]
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    if not readings:
+        return jsonify([])
 
-    return jsonify({
-        "domestic_usage": domestic_usage,
-        "flush_usage": flush_usage,
-        "total_usage": total_usage,
-        "anomaly_flag": anomaly
-    })
+    return jsonify(save_readings(readings))
 
 @app.route("/dashboard")
 @role_required(["admin","manager"])
 def dashboard():
 
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT hostel_name, domestic_usage, flush_usage,
-               total_usage, anomaly_flag
-        FROM readings
-        WHERE date=(SELECT MAX(date) FROM readings)
-    """)
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    data_map = {row[0]: row for row in rows}
-
-    areas_data=[]
-    total_today=0
-    total_domestic=0
-    total_flush=0
-
-    for area in AREAS:
-        if area in data_map:
-            row=data_map[area]
-            domestic=row[1]
-            flush=row[2]
-            total=row[3]
-            anomaly=row[4]
-        else:
-            domestic=flush=total=anomaly=0
+    cached = cache_get("dashboard")
+    if cached is not None:
+        return app.response_class(cached, mimetype="application/json")
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Latest day's reading per hostel, plus the day's totals
+            cur.execute("""
+                WITH latest AS (
+                    SELECT DISTINCT ON (hostel_name)
+                           hostel_name, domestic_usage, flush_usage,
+                           total_usage, anomaly_flag
+                    FROM readings
+                    WHERE date=(SELECT MAX(date) FROM readings)
+                      AND hostel_name = ANY(%s)
+                    ORDER BY hostel_name, id DESC
+                )
+                SELECT hostel_name, domestic_usage, flush_usage,
+                       total_usage, anomaly_flag,
+                       SUM(domestic_usage) OVER (),
+                       SUM(flush_usage) OVER (),
+                       SUM(total_usage) OVER ()
+                FROM latest
+            """,(AREAS,))
+
+            rows = cur.fetchall()
+
+    if rows:
+        total_domestic,total_flush,total_today=rows[0][5:]
+    else:
+        total_domestic=total_flush=total_today=0.0
+
+    # One row per area: domestic, flush, total, anomaly
+    usage=np.zeros((len(AREAS),4))
+    for row in rows:
+        usage[AREA_IDX[row[0]]]=row[1:5]
 
-        areas_data.append({
+    areas_data=[
+        {
             "hostel_name":area,
             "domestic_usage":domestic,
             "flush_usage":flush,
             "total_usage":total,
-            "anomaly_flag":anomaly
-        })
+            "anomaly_flag":int(anomaly)
+        }
+        for area,(domestic,flush,total,anomaly) in zip(AREAS,usage.tolist())
+    ]
 
-        total_domestic+=domestic
-        total_flush+=flush
-        total_today+=total
-
-    top_areas=sorted(
+    top_areas=heapq.nlargest(
+        3,
         areas_data,
-        key=lambda x:x["total_usage"],
-        reverse=True
-    )[:3]
+        key=lambda x:x["total_usage"]
+    )
 
-    return jsonify({
+    body=app.json.dumps({
         "areas":areas_data,
         "total_today":total_today,
         "total_domestic":total_domestic,
         "total_flush":total_flush,
         "top_areas":top_areas
     })
+    cache_set("dashboard",body)
+
+    return app.response_class(body,mimetype="application/json")
+
+def linear_forecast(values,periods):
+    # Least-squares line per column, `periods` days ahead, clipped at zero
+    n=values.shape[0]
+    x=np.arange(n,dtype=np.float64)
+    dx=x-x.mean()
+    denom=dx@dx
+
+    if denom:
+        slope=dx@(values-values.mean(axis=0))/denom
+    else:
+        slope=np.zeros(values.shape[1])
+
+    intercept=values.mean(axis=0)-slope*x.mean()
+    future_x=np.arange(n,n+periods,dtype=np.float64)[:,None]
+
+    return np.maximum(future_x*slope+intercept,0).round(2)
 
 @app.route("/trend")
 @role_required(["admin","manager"])
@@ -318,72 +606,83 @@ def trend():
 
     areas=areas_param.split(",")
 
-    conn=get_connection()
-    cur=conn.cursor()
+    # Area order in the query string doesn't change the result
+    cache_key=("trend",tuple(sorted(set(areas))))
+
+    cached=cache_get(cache_key)
+    if cached is not None:
+        return app.response_class(cached,mimetype="application/json")
 
-    cur.execute("""
-        SELECT date, domestic_usage, flush_usage
-        FROM readings
-        WHERE hostel_name = ANY(%s)
-        ORDER BY date ASC
-    """,(areas,))
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            # Sum the selected areas per day in Postgres: one row per date
+            cur.execute("""
+                SELECT date, SUM(domestic_usage), SUM(flush_usage)
+                FROM readings
+                WHERE hostel_name = ANY(%s)
+                GROUP BY date
+                ORDER BY date ASC
+            """,(areas,))
 
-    rows=cur.fetchall()
+            rows=cur.fetchall()
 
     if not rows:
         return jsonify({"data":[]})
 
-    historical={}
-    for row in rows:
-        date=row[0]
-        domestic=row[1]
-        flush=row[2]
+    # date.isoformat() is the C-level equivalent of strftime("%Y-%m-%d")
+    trend_data=[
+        {
+            "date":date.isoformat(),
+            "domestic":domestic,
+            "flush":flush,
+            "is_forecast":False
+        }
+        for date,domestic,flush in rows
+    ]
 
-        if date not in historical:
-            historical[date]={"domestic":0,"flush":0}
+    latest_date=rows[-1][0]
+    last_7=np.asarray([row[1:] for row in rows[-7:]],dtype=np.float64)
 
-        historical[date]["domestic"]+=domestic
-        historical[date]["flush"]+=flush
+    forecast=linear_forecast(last_7,3)
+    forecast_dates=[(latest_date+timedelta(days=i)).isoformat() for i in range(1,4)]
 
-    sorted_dates=sorted(historical.keys())
-    trend_data=[]
+    trend_data.extend(
+        {
+            "date":date,
+            "domestic":domestic,
+            "flush":flush,
+            "is_forecast":True
+        }
+        for date,(domestic,flush) in zip(forecast_dates,forecast.tolist())
+    )
 
-    for date in sorted_dates:
-        trend_data.append({
-            "date":date.strftime("%Y-%m-%d"),
-            "domestic":historical[date]["domestic"],
-            "flush":historical[date]["flush"],
-            "is_forecast":False
-        })
+    body=app.json.dumps({"data":trend_data})
+    cache_set(cache_key,body)
 
-    latest_date=sorted_dates[-1]
-    last_7=sorted_dates[-7:] if len(sorted_dates)>=7 else sorted_dates
-    x=np.arange(len(last_7))
+    return app.response_class(body,mimetype="application/json")
 
-    domestic_vals=[historical[d]["domestic"] for d in last_7]
-    flush_vals=[historical[d]["flush"] for d in last_7]
+def export_csv_chunks(start_date,end_date):
+    # Yields CSV in batches; nothing at all if the range is empty
+    with get_conn() as conn:
+        with conn.cursor(name="export_csv") as cur:
+            cur.itersize=EXPORT_BATCH_ROWS
+            cur.execute(EXPORT_SQL,(*EXPORT_PARAMS,start_date,end_date))
 
-    domestic_coef=np.polyfit(x,domestic_vals,1)
-    flush_coef=np.polyfit(x,flush_vals,1)
+            batch=cur.fetchmany(EXPORT_BATCH_ROWS)
+            header=True
 
-    for i in range(1,4):
-        next_date=latest_date+timedelta(days=i)
-        future_x=len(last_7)+i-1
+            while batch:
+                buf=io.StringIO()
+                writer=csv.writer(buf)
 
-        domestic_pred=domestic_coef[0]*future_x+domestic_coef[1]
-        flush_pred=flush_coef[0]*future_x+flush_coef[1]
+                if header:
+                    writer.writerow(["Date",*EXPORT_COLUMNS])
+                    header=False
 
-        trend_data.append({
-            "date":next_date.strftime("%Y-%m-%d"),
-            "domestic":round(max(domestic_pred,0),2),
-            "flush":round(max(flush_pred,0),2),
-            "is_forecast":True
-        })
+                writer.writerows(batch)
+                yield buf.getvalue()
 
-    cur.close()
-    conn.close()
-
-    return jsonify({"data":trend_data})
+                batch=cur.fetchmany(EXPORT_BATCH_ROWS)
 
 @app.route("/export")
 @role_required(["admin","manager"])
@@ -392,56 +691,50 @@ def export_data():
     start_date=request.args.get("start_date")
     end_date=request.args.get("end_date")
 
-    conn=get_connection()
-
-    df=pd.read_sql("""
-        SELECT date, hostel_name,
-               domestic_usage, flush_usage
-        FROM readings
-        WHERE date BETWEEN %s AND %s
-        ORDER BY date ASC
-    """,conn,params=(start_date,end_date))
+    if request.args.get("format")=="csv":
+        chunks=export_csv_chunks(start_date,end_date)
 
-    conn.close()
-
-    if df.empty:
-        return {"error":"No data found"},404
+        # Pull the first batch now so an empty range can still get a 404
+        first=next(chunks,None)
+        if first is None:
+            return {"error":"No data found"},404
 
-    pivot_domestic=df.pivot_table(
-        index="date",
-        columns="hostel_name",
-        values="domestic_usage",
-        aggfunc="sum"
-    ).fillna(0)
+        response=app.response_class(
+            itertools.chain([first],chunks),
+            mimetype="text/csv"
+        )
+        response.headers["Content-Disposition"]="attachment; filename=structured_water_report.csv"
+        # chain() has no close(), so release the connection on disconnect
+        response.call_on_close(chunks.close)
+        return response
 
-    pivot_flush=df.pivot_table(
-        index="date",
-        columns="hostel_name",
-        values="flush_usage",
-        aggfunc="sum"
-    ).fillna(0)
+    output=tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
 
-    for area in AREAS:
-        if area not in pivot_domestic.columns:
-            pivot_domestic[area]=0
-        if area not in pivot_flush.columns:
-            pivot_flush[area]=0
+    # constant_memory needs rows written in order
+    workbook=xlsxwriter.Workbook(output,{
+        "constant_memory":True,
+        "default_date_format":"yyyy-mm-dd"
+    })
+    sheet=workbook.add_worksheet()
+    header_format=workbook.add_format({"bold":True,"border":1})
 
-    pivot_domestic=pivot_domestic[AREAS]
-    pivot_flush=pivot_flush[AREAS]
+    sheet.write_row(0,0,["Date",*EXPORT_COLUMNS],header_format)
 
-    combined=pd.DataFrame()
-    combined["Date"]=pivot_domestic.index
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(EXPORT_SQL,(*EXPORT_PARAMS,start_date,end_date))
 
-    for area in AREAS:
-        combined[f"{area} F"]=pivot_flush[area].values
-        combined[f"{area} D"]=pivot_domestic[area].values
+            for i,row in enumerate(cur,start=1):
+                sheet.write_row(i,0,row)
 
-    output=io.BytesIO()
+            found=cur.rowcount>0
 
-    with pd.ExcelWriter(output,engine="openpyxl") as writer:
-        combined.to_excel(writer,index=False)
+    if not found:
+        workbook.close()
+        output.close()
+        return {"error":"No data found"},404
 
+    workbook.close()
     output.seek(0)
 
     return send_file(
@@ -451,6 +744,10 @@ def export_data():
         mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
+HOME_JSON = app.json.dumps({"message":"Full Water Intelligence Backend Running with Auth"})
+
 @app.route("/")
 def home():
-    return {"message":"Full Water Intelligence Backend Running with Auth"}
\ No newline at end of file
+    response = app.response_class(HOME_JSON, mimetype="application/json")
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
\ No newline at end of file
@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+
+# Picked up automatically by `gunicorn app:app` from the project root.
+# The bind address comes from $PORT, which gunicorn reads by default.
+
+worker_class = "gthread"
+# Also sizes app.POOL_MAX_CONN: one connection per thread
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# Keep workers * threads under Postgres' max_connections
+db_connection_budget = int(os.environ.get("DB_CONNECTION_BUDGET", "80"))
+workers = int(os.environ.get(
+    "WEB_CONCURRENCY",
+    min(multiprocessing.cpu_count(), max(1, db_connection_budget // threads))
+))
+timeout = 120
+
+# Import numpy and the app once in the master; workers share it copy-on-write
+preload_app = True
+
+def post_fork(server, worker):
+    # Never reuse database sockets inherited from the master process
+    import app
+    app.reset_pool()